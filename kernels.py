@@ -0,0 +1,61 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Below this many closes the NumPy version is already fast and a JIT compile would cost more than it saves
+NUMBA_MIN_SIZE = 10_000
+
+_numba_kernel = None
+_numba_checked = False
+
+
+def _sma_and_signals_loop(close, w):
+    n = len(close)
+    sma = np.full(n, np.nan)
+    mask = np.zeros(n, dtype=np.bool_)
+    # Running sum: add the newest close and drop the oldest instead of re-summing each window.
+    # NaNs are counted rather than summed so one missing close only blanks the windows it falls in.
+    window_sum = 0.0
+    nan_count = 0
+    for i in range(n):
+        if np.isnan(close[i]):
+            nan_count += 1
+        else:
+            window_sum += close[i]
+        if i >= w:
+            if np.isnan(close[i - w]):
+                nan_count -= 1
+            else:
+                window_sum -= close[i - w]
+        if i >= w - 1 and nan_count == 0:
+            sma[i] = window_sum / w
+            mask[i] = close[i] > sma[i]
+    return sma, mask
+
+
+def _sma_and_signals_numpy(close, w):
+    sma = np.full(len(close), np.nan)
+    if len(close) >= w:
+        sma[w - 1:] = sliding_window_view(close, w).mean(axis=1)
+    return sma, close > sma
+
+
+def _get_numba_kernel():
+    # numba is optional and slow to import, so only look for it once a large series shows up
+    global _numba_kernel, _numba_checked
+    if not _numba_checked:
+        _numba_checked = True
+        try:
+            from numba import njit
+        except ImportError:
+            pass
+        else:
+            _numba_kernel = njit(cache=True, nogil=True)(_sma_and_signals_loop)
+    return _numba_kernel
+
+
+def sma_and_signals(close, w):
+    if len(close) >= NUMBA_MIN_SIZE:
+        kernel = _get_numba_kernel()
+        if kernel is not None:
+            return kernel(close, w)
+    return _sma_and_signals_numpy(close, w)
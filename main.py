@@ -1,136 +1,251 @@
 import yfinance as yf
 import os
 import csv
+import heapq
+import time
 import pandas as pd
-import matplotlib.pyplot as plt
+import numpy as np
 import requests
+from concurrent.futures import ThreadPoolExecutor
+import stock_cache
+import kernels
+
+# One Agg-backed figure reused by every chart, instead of going through pyplot each time.
+# matplotlib is only imported when the first chart is drawn to keep startup fast.
+_FIG = None
+_CANVAS = None
+
+def new_axes(figsize):
+    global _FIG, _CANVAS
+    if _FIG is None:
+        import matplotlib
+        matplotlib.use('Agg')
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        _FIG = Figure(figsize=figsize)
+        _CANVAS = FigureCanvasAgg(_FIG)
+    _FIG.clear()
+    _FIG.set_size_inches(*figsize)
+    return _FIG.add_subplot(111)
+
+_OUTPUT_READY = False
 
 def ensure_output_dir():
-    if not os.path.exists('output'):
-        os.makedirs('output')
+    global _OUTPUT_READY
+    if not _OUTPUT_READY:
+        os.makedirs('output', exist_ok=True)
+        _OUTPUT_READY = True
 
 class Stock:
     def __init__(self, ticker):
         self.quantity = None
         self.symbol = ticker.upper()
-        self.ticker = yf.Ticker(self.symbol)
+        self._ticker = None
         self.data = None
+        self._closes = None
+        self._expires_at = 0
+        # The period/interval the held data was fetched for, so a request for a different window refetches
+        self._period = None
+        self._interval = None
 
-    def get_data(self, period="1mo", interval="1d", refresh=False):
-        if self.data is None or refresh:
+    @property
+    def ticker(self):
+        # Built on first use so stocks loaded from CSV don't each set up a yfinance session
+        if self._ticker is None:
+            self._ticker = yf.Ticker(self.symbol)
+        return self._ticker
+
+    def get_data(self, period="5d", interval="1d", refresh=False):
+        if refresh or not self.is_fresh(period, interval):
+            cached = None if refresh else stock_cache.get(self.symbol, period, interval)
+            if cached is not None:
+                data, expires_at = cached
+                self.set_data(data, period, interval, expires_at)
+                return self.data
             try:
-                self.data = self.ticker.history(period=period, interval=interval)
+                self.set_data(self.ticker.history(period=period, interval=interval, auto_adjust=True), period, interval)
             except Exception as e:
                 print(f"Error fetching data for {self.symbol}: {e}")
                 return None
+            if self.data is not None and not self.data.empty:
+                stock_cache.put(self.symbol, period, interval, self.data)
         return self.data
 
-    def get_price(self):
-        data = self.get_data()
-        if data is None or data.empty:
-            return None
-        try:
-            price = data['Close'].iloc[-1]
-        except Exception as e:
-            print(f"Error fetching price for {self.symbol}: {e}")
-            return None
-        return price
-
-    def get_value(self):
-        return self.get_price() * self.quantity
+    def is_fresh(self, period="5d", interval="1d"):
+        return (self.data is not None and self._period == period and self._interval == interval
+                and time.time() < self._expires_at)
 
-    def get_daily_change_percent(self):
-        data = self.get_data()
-        # We need at least two days of data to compare today vs yesterday
-        if data is None or len(data) < 2:
-            return None
-        try:
-            yesterday_close = data['Close'].iloc[-2]
-            today_close = data['Close'].iloc[-1]
+    def set_data(self, data, period, interval, expires_at=None):
+        # Only Close is ever read, so drop the other OHLCV columns to keep each stock small
+        if data is not None and 'Close' in data:
+            data = data[['Close']]
+        self.data = data
+        self._period = period
+        self._interval = interval
+        # Data loaded from disk keeps the expiry it was cached with; fresh downloads get a new one
+        self._expires_at = expires_at if expires_at is not None else time.time() + stock_cache.ttl(data)
+        # Cache the closing prices once so price lookups skip pandas indexing
+        if data is None or data.empty:
+            self._closes = None
+        else:
+            self._closes = data['Close'].to_numpy(dtype=np.float64, copy=True)
 
-            # Calculate percentage change
-            change_percent = ((today_close - yesterday_close) / yesterday_close) * 100
-            return change_percent
-        except Exception as e:
-            print(f"Error calculating daily change for {self.symbol}: {e}")
+    def get_price(self):
+        self.get_data()
+        if self._closes is None:
             return None
+        return self._closes[-1]
 
     def plot_history(self):
-        data = self.get_data()
+        # Prices only need the last few days; the chart needs a full month
+        data = self.get_data(period="1mo")
         if data is None:
             return None
         print(data.head())
-        sma_5 = data['Close'].rolling(window=5).mean()
-        # print days where the close price is greater than the 5-day SMA
-        buy_signals = data['Close'] > sma_5
-        plot_signals = data[buy_signals]
+        close = data['Close'].to_numpy(dtype=float)
+        # buy signals are days where the close price is greater than the 5-day SMA
+        sma_5, buy_signals = kernels.sma_and_signals(close, 5)
         print("Buy signals:")
         print(data[buy_signals])
         # Graphing
-        plt.figure(figsize=(10, 10))
-        plt.plot(data['Close'], label='Price', color='blue')
-        plt.plot(sma_5, label='5-day SMA', color='red')
-        plt.scatter(plot_signals.index, plot_signals['Close'], color='green', label='Buy Signals', marker='^', zorder=3)
-        plt.title(f'{self.symbol} Price History')
-        plt.xlabel('Date')
-        plt.xticks(rotation=45)
-        plt.ylabel('Price ($)')
-        plt.legend()
+        ax = new_axes((10, 10))
+        ax.plot(data.index, close, label='Price', color='blue')
+        ax.plot(data.index, sma_5, label='5-day SMA', color='red')
+        ax.scatter(data.index[buy_signals], close[buy_signals], color='green', label='Buy Signals', marker='^', zorder=3)
+        ax.set_title(f'{self.symbol} Price History')
+        ax.set_xlabel('Date')
+        ax.tick_params(axis='x', labelrotation=45)
+        ax.set_ylabel('Price ($)')
+        ax.legend()
         # Save instead of blocking GUI show to avoid macOS backend hang
-        plt.tight_layout()
+        ax.figure.tight_layout()
         ensure_output_dir()
         out_path = os.path.join('output', f"{self.symbol}_history.png")
-        plt.savefig(out_path)
-        plt.close()
+        ax.figure.savefig(out_path)
         print(f"Saved history chart to '{out_path}'.")
 
 class Portfolio:
     def __init__(self):
         self.stocks = {}
+        # Holdings read from CSV stay as plain quantities until a Stock is actually needed
+        self._pending = {}
+        # Tickers in the order they appeared in the CSV, so saving doesn't reshuffle the file
+        self._csv_order = []
         # Load the existing portfolio if available
         if os.path.exists('output/portfolio.csv'):
             try:
                 with open('output/portfolio.csv', 'r') as csvfile:
-                    reader = csv.DictReader(csvfile)
+                    reader = csv.reader(csvfile)
+                    next(reader, None)  # skip the Ticker,Quantity header
                     for row in reader:
-                        ticker = row['Ticker']
-                        qty = int(row['Quantity'])
-
-                        stock = Stock(ticker)
-                        stock.quantity = qty
-                        self.stocks[ticker] = stock
-                print(f"Loaded {len(self.stocks)} stocks from portfolio.csv")
+                        if not row:
+                            continue  # DictReader skipped blank lines; keep tolerating them
+                        if len(row) < 2:
+                            print(f"Skipping malformed row in portfolio.csv: {row}")
+                            continue
+                        # Extra fields (e.g. a trailing comma from a spreadsheet export) are ignored
+                        ticker, qty = row[0], row[1]
+                        self._pending[ticker] = int(qty)
+                        self._csv_order.append(ticker)
+                print(f"Loaded {len(self._pending)} stocks from portfolio.csv")
             except Exception as e:
                 print(f"Error loading portfolio: {e}")
 
-    def __str__(self):
-        result = "Portfolio Holdings:\n"
-        # Added 'Change %' to the header
-        result += f"{'Ticker':<10} {'Price':<10} {'Change %':<10} {'Qty':<10} {'Value':<10}\n"
-        result += "-" * 52 + "\n"
-
-        for ticker, stock in self.stocks.items():
-            price = stock.get_price()
-            qty = stock.quantity
-            change = stock.get_daily_change_percent()
+    def __contains__(self, ticker):
+        return ticker in self.stocks or ticker in self._pending
 
-            if price is not None and qty is not None:
-                value = price * qty
+    def get_stock(self, ticker):
+        # Build the Stock for a CSV-loaded holding the first time it is asked for
+        if ticker in self._pending:
+            stock = Stock(ticker)
+            stock.quantity = self._pending.pop(ticker)
+            self.stocks[ticker] = stock
+        return self.stocks.get(ticker)
 
-                # Format the change string (e.g., +1.25% or -0.50%)
-                if change is not None:
-                    # The '+' forces a plus sign for positive numbers
-                    change_str = f"{change:>+7.2f}%"
-                else:
-                    change_str = "N/A"
+    def _materialize_all(self):
+        for ticker in list(self._pending):
+            self.get_stock(ticker)
 
-                result += f"{ticker:<10} ${price:<9.2f} {change_str:<10} {qty:<10} ${value:.2f}\n"
+    def _refresh_all(self, period="5d", interval="1d"):
+        self._materialize_all()
+        # Fetch every holding in one batched download instead of one request per ticker
+        stocks = []
+        for stock in self.stocks.values():
+            if stock.is_fresh(period, interval):
+                continue
+            cached = stock_cache.get(stock.symbol, period, interval)
+            if cached is not None:
+                data, expires_at = cached
+                stock.set_data(data, period, interval, expires_at)
             else:
-                result += f"{ticker}: Error (Price: {price}, Qty: {qty})\n"
-        return result
+                stocks.append(stock)
+        if not stocks:
+            return
+        # Yahoo accepts roughly 20 symbols per request, so chunk larger portfolios
+        for chunk in [stocks[i:i + 20] for i in range(0, len(stocks), 20)]:
+            symbols = [stock.symbol for stock in chunk]
+            try:
+                data = yf.download(symbols, period=period, interval=interval, group_by='ticker',
+                                   threads=True, progress=False, auto_adjust=True)
+            except Exception as e:
+                print(f"Error fetching data for {', '.join(symbols)}: {e}")
+                continue
+            for stock in chunk:
+                try:
+                    stock.set_data(data[stock.symbol].dropna(), period, interval)
+                except KeyError:
+                    stock.set_data(None, period, interval)
+                    continue
+                if not stock.data.empty:
+                    stock_cache.put(stock.symbol, period, interval, stock.data)
+        self._prefetch_parallel(period=period, interval=interval)
+
+    def _prefetch_parallel(self, period="5d", interval="1d"):
+        # Fall back to concurrent per-ticker fetches for anything the batch missed
+        pending = [stock for stock in self.stocks.values() if not stock.is_fresh(period, interval)]
+        if len(pending) > 1:
+            with ThreadPoolExecutor(max_workers=min(16, len(pending))) as executor:
+                list(executor.map(lambda stock: stock.get_data(period=period, interval=interval, refresh=True), pending))
+        elif pending:
+            pending[0].get_data(period=period, interval=interval, refresh=True)
+
+    def _snapshot(self):
+        # Latest close and quantity of every priced holding, as parallel arrays
+        valid = [(ticker, stock) for ticker, stock in self.stocks.items()
+                 if stock._closes is not None and stock.quantity is not None]
+        closes = np.array([stock._closes[-1] for _, stock in valid], dtype=float)
+        qtys = np.array([stock.quantity for _, stock in valid], dtype=np.int64)
+        return valid, closes, qtys
+
+    def __str__(self):
+        self._refresh_all()
+        # Pull the last two closes and quantities into columns and compute every row at once
+        valid, closes, qtys = self._snapshot()
+        prev = np.array([stock._closes[-2] if len(stock._closes) >= 2 else np.nan for _, stock in valid], dtype=float)
+        changes = (closes - prev) / prev * 100.0
+        values = closes * qtys
+
+        # Collect lines and join once rather than growing a string row by row
+        parts = ["Portfolio Holdings:"]
+        if valid:
+            df = pd.DataFrame({'Price': closes, 'Change %': changes, 'Qty': qtys, 'Value': values},
+                              index=pd.Index([ticker for ticker, _ in valid], name='Ticker'))
+            # The '+' forces a plus sign for positive changes (e.g., +1.25% or -0.50%)
+            # pandas fills missing values with na_rep before the formatters run
+            parts.append(df.to_string(na_rep="N/A", formatters={
+                'Price': lambda x: f"${x:.2f}",
+                'Change %': lambda x: f"{x:+.2f}%",
+                'Value': lambda x: f"${x:.2f}",
+            }))
+
+        for ticker, stock in self.stocks.items():
+            if stock._closes is None or stock.quantity is None:
+                price = stock._closes[-1] if stock._closes is not None else None
+                parts.append(f"{ticker}: Error (Price: {price}, Qty: {stock.quantity})")
+        return "\n".join(parts) + "\n"
 
     def add_stock(self, ticker, quantity):
-        if ticker in self.stocks:
+        if ticker in self:
             print(f"Stock {ticker} is already in portfolio.")
             return
 
@@ -146,8 +261,9 @@ class Portfolio:
             print(f"Added {ticker} to portfolio.")
 
     def remove_stock(self, ticker):
-        if ticker in self.stocks:
-            self.stocks.pop(ticker)
+        if ticker in self:
+            self.stocks.pop(ticker, None)
+            self._pending.pop(ticker, None)
             print(f"Removed stock {ticker} from portfolio")
         else:
             print(f"Stock {ticker} is not in portfolio")
@@ -155,45 +271,50 @@ class Portfolio:
     def save_to_csv(self):
         ensure_output_dir()
         with open('output/portfolio.csv', 'w', newline='') as csvfile:
-            fieldnames = ['Ticker', 'Quantity']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            for ticker, stock in self.stocks.items():
-                writer.writerow({'Ticker': ticker, 'Quantity': stock.quantity})
+            writer = csv.writer(csvfile)
+            writer.writerow(['Ticker', 'Quantity'])
+            # Original CSV order first, then anything added this session
+            for ticker in dict.fromkeys(self._csv_order + list(self._pending) + list(self.stocks)):
+                if ticker in self._pending:
+                    writer.writerow([ticker, self._pending[ticker]])
+                elif ticker in self.stocks:
+                    writer.writerow([ticker, self.stocks[ticker].quantity])
         print(f"Saved portfolio to 'output/portfolio.csv'")
 
     def generate_chart(self):
-        if not self.stocks:
+        if not self.stocks and not self._pending:
             print("No stocks in portfolio to generate chart for.")
             return
+        self._refresh_all()
         try:
             valid_stocks = []
             for ticker, stock in self.stocks.items():
                 price = stock.get_price()
                 if price is not None:
                     valid_stocks.append((ticker, price))
-            sorted_stocks = sorted(valid_stocks, key=lambda x: x[1], reverse=True)
-            top5 = sorted_stocks[:5]
+            top5 = heapq.nlargest(5, valid_stocks, key=lambda x: x[1])
             tickers = [stock[0] for stock in top5]
             prices = [stock[1] for stock in top5]
-            plt.bar(tickers, prices, color='blue', width=0.5, align='center')
-            plt.xlabel('Stock Ticker')
-            plt.ylabel('Price in USD ($)')
-            plt.title('Stock Price Watchlist')
+            ax = new_axes((6.4, 4.8))
+            ax.bar(tickers, prices, color='blue', width=0.5, align='center')
+            ax.set_xlabel('Stock Ticker')
+            ax.set_ylabel('Price in USD ($)')
+            ax.set_title('Stock Price Watchlist')
             # display the graph (save instead of show to avoid GUI backend blocking)
-            plt.tight_layout()
+            ax.figure.tight_layout()
             ensure_output_dir()
-            plt.savefig('output/chart.png')
-            plt.close()
+            ax.figure.savefig('output/chart.png')
             print("Saved bar chart to 'output/chart.png'.")
         except Exception as e:
             print(f"Error generating chart: {e}")
 
     def get_total_value(self):
-        total_value = sum(stock.get_value() for stock in self.stocks.values())
-        return total_value
+        self._refresh_all()
+        _, closes, qtys = self._snapshot()
+        return float(np.dot(closes, qtys))
 
 def main():
+    ensure_output_dir()
     portfolio = Portfolio()
     # enter stock ticker
     print("Welcome to the Alpha Dashboard!")
@@ -216,8 +337,8 @@ def main():
             case "history":
                 user_input = input("Enter ticker: ").upper().strip()
                 # Does it already exist in portfolio?
-                if user_input in portfolio.stocks:
-                    portfolio.stocks[user_input].plot_history()  # Reuse existing
+                if user_input in portfolio:
+                    portfolio.get_stock(user_input).plot_history()  # Reuse existing
                 else:
                     stock = Stock(user_input)  # Only create new if necessary
                     stock.plot_history()
@@ -0,0 +1,66 @@
+import datetime
+import glob
+import os
+import pickle
+import time
+
+import pandas as pd
+
+CACHE_DIR = os.path.join('output', '.cache')
+
+# Bars can still move on any weekday (the session is live or about to open), so those
+# frames only live briefly; weekend data is settled until the exchange's next midnight
+LIVE_TTL = 15 * 60
+SETTLED_TTL = 24 * 60 * 60
+
+
+def _prefix(symbol, period, interval):
+    return os.path.join(CACHE_DIR, f"{symbol}_{period}_{interval}_")
+
+
+def _paths(symbol, period, interval):
+    # Today's date is part of the key so yesterday's entry is never served as today's
+    base = _prefix(symbol, period, interval) + datetime.date.today().isoformat()
+    return base + '.pkl', base + '.ts'
+
+
+def ttl(data):
+    if data is None or data.empty:
+        return LIVE_TTL
+    # Judge the day in the exchange's timezone, not the user's
+    now = pd.Timestamp.now(tz=data.index.tz)
+    if now.weekday() < 5:
+        return LIVE_TTL
+    # Cap at the exchange's next midnight so a Sunday fetch never carries into Monday's session
+    next_midnight = (now + pd.Timedelta(days=1)).normalize()
+    return min(SETTLED_TTL, (next_midnight - now).total_seconds())
+
+
+def get(symbol, period, interval):
+    """Return (data, expires_at) for a live cache entry, or None."""
+    data_path, ts_path = _paths(symbol, period, interval)
+    try:
+        with open(ts_path, 'r') as f:
+            expires_at = float(f.read())
+        if time.time() >= expires_at:
+            return None
+        with open(data_path, 'rb') as f:
+            return pickle.load(f), expires_at
+    except (OSError, ValueError, pickle.UnpicklingError, EOFError):
+        return None
+
+
+def put(symbol, period, interval, data):
+    data_path, ts_path = _paths(symbol, period, interval)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # Drop entries left over from earlier days
+        for old_path in glob.glob(_prefix(symbol, period, interval) + '*'):
+            if old_path not in (data_path, ts_path):
+                os.remove(old_path)
+        with open(data_path, 'wb') as f:
+            pickle.dump(data, f)
+        with open(ts_path, 'w') as f:
+            f.write(str(time.time() + ttl(data)))
+    except OSError as e:
+        print(f"Error caching data for {symbol}: {e}")